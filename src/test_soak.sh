@@ -0,0 +1,657 @@
+#!/bin/bash
+
+# ================================================================================
+# Configuration
+# ================================================================================
+# LLM server IP & nginx authorization key
+#TARGET_URL=
+#TARGET_KEY=
+
+# Soak settings (override from the environment, e.g. SOAK_DURATION_MIN=240 bash test_soak.sh)
+SOAK_DURATION_MIN=${SOAK_DURATION_MIN:-60}
+SOAK_SESSIONS=${SOAK_SESSIONS:-4}
+SOAK_SESSION_TURNS=${SOAK_SESSION_TURNS:-20}
+SOAK_SAMPLE_SEC=${SOAK_SAMPLE_SEC:-60}
+SOAK_THINK_TIME_SEC=${SOAK_THINK_TIME_SEC:-2}
+
+# Alert thresholds
+SOAK_BASELINE_SAMPLES=${SOAK_BASELINE_SAMPLES:-3}
+SOAK_RSS_GROWTH_MB=${SOAK_RSS_GROWTH_MB:-50}
+SOAK_CONN_GROWTH=${SOAK_CONN_GROWTH:-$((SOAK_SESSIONS * 2))}
+SOAK_LATENCY_DRIFT_PCT=${SOAK_LATENCY_DRIFT_PCT:-30}
+SOAK_ERROR_RATE_PCT=${SOAK_ERROR_RATE_PCT:-10}
+
+# Styling Variables
+BOLD='\033[1m'
+BLUE='\033[0;34m'
+GREEN='\033[0;32m'
+CYAN='\033[0;36m'
+YELLOW='\033[1;33m'
+RED='\033[0;31m'
+NC='\033[0m'
+
+# Helper function for headers
+function log_step() {
+    echo -e "${BLUE}------------------------------------------------------------${NC}"
+    echo -e "${BOLD}${CYAN}STEP $1:${NC} ${GREEN}$2${NC}"
+    echo -e "${BLUE}------------------------------------------------------------${NC}"
+}
+
+# ================================================================================
+# 1. Connection Check
+# ================================================================================
+log_step "1" "Testing Connection to Server ($TARGET_URL)"
+echo -e "${YELLOW}Pinging server models endpoint...${NC}"
+
+if curl -H "Authorization: Bearer $TARGET_KEY" --connect-timeout 3 -s "$TARGET_URL/models" > /dev/null; then
+    echo -e "${GREEN}SUCCESS: Server is reachable!${NC}"
+else
+    echo -e "${RED}ERROR: Cannot reach $TARGET_URL${NC}"
+    echo -e "${RED}Possible causes:${NC}"
+    echo -e "1. The Nginx key is incorrect."
+    echo -e "2. The server on 10.128.0.20 is not running."
+    echo -e "3. A firewall is blocking port 8080."
+    echo -e "4. The server is still busy generating a huge response (Restart the GPU container!)."
+    echo -e "5. The server IP/Port is incorrect."
+    exit 1
+fi
+
+# ================================================================================
+# 2. Setup Environment
+# ================================================================================
+log_step "2" "Setting up build environment"
+mkdir -p soak_bot_build
+cd soak_bot_build
+cp ../instructions.json .
+
+# ================================================================================
+# 3. Create Python Script
+# ================================================================================
+log_step "3" "Generating Python client code (main.py)"
+cat << 'EOF' > main.py
+import os
+import sys
+import time
+import json
+import threading
+import statistics
+import instructor
+
+from pydantic import BaseModel, Field
+from openai import OpenAI
+
+# --------------------------------------------------------------------------------
+# Configuration
+# --------------------------------------------------------------------------------
+# Colors
+CYAN   = '\033[96m'
+GREEN  = '\033[92m'
+YELLOW = '\033[93m'
+RED    = '\033[91m'
+RESET  = '\033[0m'
+
+llm_url = os.getenv("LLM_URL", "http://localhost:8000/v1")
+llm_key = os.getenv("LLM_KEY", "SAMPLE_TOKEN")
+
+# MODEL SELECTION
+# Options: phi3-buddy | phi3.5-mini | qwen2.5-3b | qwen2.5-3b-speculative | qwen2.5-0.5b
+MODEL = "phi3.5-mini"
+
+# --------------------------------------------------------------------------------
+# Soak Settings
+# --------------------------------------------------------------------------------
+DURATION_MIN     = float(os.getenv("SOAK_DURATION_MIN", "60"))   # total run time
+SESSIONS         = int(os.getenv("SOAK_SESSIONS", "4"))          # concurrent simulated robots
+SESSION_TURNS    = int(os.getenv("SOAK_SESSION_TURNS", "20"))    # turns before a session starts over
+THINK_TIME_SEC   = float(os.getenv("SOAK_THINK_TIME_SEC", "2"))  # pause between turns (user "speaking")
+SAMPLE_SEC       = float(os.getenv("SOAK_SAMPLE_SEC", "60"))     # how often we sample RSS/connections/latency
+
+# Alert thresholds
+BASELINE_SAMPLES  = int(os.getenv("SOAK_BASELINE_SAMPLES", "3"))         # first N samples = baseline
+RSS_GROWTH_MB     = float(os.getenv("SOAK_RSS_GROWTH_MB", "50"))         # RSS growth over baseline
+CONN_GROWTH       = int(os.getenv("SOAK_CONN_GROWTH", str(SESSIONS * 2)))  # extra sockets over baseline
+LATENCY_DRIFT_PCT = float(os.getenv("SOAK_LATENCY_DRIFT_PCT", "30"))     # p50 slow-down over baseline
+ERROR_RATE_PCT    = float(os.getenv("SOAK_ERROR_RATE_PCT", "10"))        # max error rate, and max rise over baseline (points)
+
+CLIENT_TIMEOUT_SEC = 20.0
+
+# Exit code when alerts fired (1 is left for crashes, e.g. a bad instructions.json).
+ALERT_EXIT_CODE = 2
+
+# --------------------------------------------------------------------------------
+# Scenario Prompting
+# --------------------------------------------------------------------------------
+# read the scenario instructions from the mounted file path.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTRUCTIONS_JSON_PATH = os.getenv(
+    "INSTRUCTIONS_JSON",
+    os.path.join(SCRIPT_DIR, "instructions.json")
+)
+
+# Starting scenario
+START_SCENARIO = os.getenv("START_SCENARIO", "start_conversation")
+
+# Simulated user lines, cycled per session (offset by session id so sessions differ).
+USER_MESSAGES = [
+    "Hi QT!",
+    "You can call me Ana.",
+    "My granddaughter visited, it was sweet.",
+    "We looked at old photos and laughed.",
+    "A picture of our first house from the 70s.",
+    "It felt simpler back then. Why do you think that is?",
+    "I used to love gardening, mostly tomatoes and roses.",
+    "My knees don't let me kneel much anymore.",
+    "Do you like music? I listen to jazz in the evenings.",
+    "Sometimes I feel a bit lonely when it gets quiet.",
+    "What did you mean by that last part?",
+    "Thanks for chatting, I'm going to rest now.",
+]
+
+def load_scenarios(path: str) -> list[dict]:
+    """Load scenario list from JSON."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError("instructions.json must be a JSON list of scenario objects.")
+    return data
+
+def format_available_scenarios(scenarios: list[dict]) -> str:
+    """
+    Turn:
+      [{"name": "...", "short_description": "..."}]
+    into:
+      - name: short_description
+    """
+    lines = []
+    for s in scenarios:
+        name = s.get("name", "").strip()
+        desc = (s.get("short_description") or "").strip()
+        if name:
+            lines.append(f"- {name}: {desc}")
+    # Ensure start scenario is always present
+    if not any((s.get("name") or "").strip() == START_SCENARIO for s in scenarios):
+        lines.insert(0, f"- {START_SCENARIO}: starting state of the conversation")
+    return "\n".join(lines)
+
+def get_instruction_text(scenarios: list[dict], current_scenario: str) -> str:
+    """Find the instruction blob for the current scenario."""
+    for s in scenarios:
+        if (s.get("name") or "").strip() == current_scenario:
+            return (s.get("instruction") or "").strip()
+    # Fallback if scenario not found
+    return "No instructions found for this scenario. Stay in the current scenario and respond briefly."
+
+def build_system_prompt(*, available_scenarios_text: str, current_scenario: str, instructions_text: str) -> str:
+    """
+    A stricter, simpler prompt focused on:
+      - generating assistant_response
+      - predicting next_scenario
+    """
+    return f"""
+You are a scenario-based conversational assistant.
+
+The conversation is structured into SCENARIOS (stages). You will be given:
+- AVAILABLE_SCENARIOS (names + descriptions)
+- CURRENT_SCENARIO
+- INSTRUCTIONS for CURRENT_SCENARIO
+
+AVAILABLE_SCENARIOS:
+{available_scenarios_text}
+
+CURRENT_SCENARIO: "{current_scenario}"
+
+INSTRUCTIONS FOR CURRENT_SCENARIO:
+----------------
+{instructions_text}
+----------------
+
+Your job each turn:
+1) Read the user's most recent message AND the chat history.
+2) Follow the CURRENT_SCENARIO instructions to write the best next reply.
+3) Decide NEXT_SCENARIO:
+   - If the goals of CURRENT_SCENARIO are NOT met, keep next_scenario == CURRENT_SCENARIO.
+   - If the goals ARE met, choose the best next scenario from AVAILABLE_SCENARIOS.
+
+STRICT OUTPUT CONTRACT:
+- Output exactly ONE JSON object and nothing else.
+- No markdown, no code fences, no extra text.
+- Keys must be exactly: "assistant_response", "next_scenario"
+- "next_scenario" must be either CURRENT_SCENARIO or one of AVAILABLE_SCENARIOS.
+""".strip()
+
+# --------------------------------------------------------------------------------
+# Pydantic Output Model
+# --------------------------------------------------------------------------------
+class ScenarioResponse(BaseModel):
+    assistant_response: str = Field(..., description="Short natural language reply to the user's last message.")
+    next_scenario: str = Field(..., description="Scenario name to use for the next turn.")
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+def validate_next_scenario(next_scenario: str, allowed: set[str], current: str) -> tuple[bool, str]:
+    """Validate next_scenario against allowed set; return (ok, error_message)."""
+    if next_scenario == current:
+        return True, ""
+    if next_scenario in allowed:
+        return True, ""
+    return False, f'next_scenario="{next_scenario}" is not in allowed scenarios (or current scenario).'
+
+def make_client():
+    """One client per session, like one robot holding its own connection pool."""
+    return instructor.from_openai(
+        OpenAI(
+            base_url=llm_url,
+            api_key=llm_key,
+            timeout=CLIENT_TIMEOUT_SEC,
+        ),
+        mode=instructor.Mode.JSON
+    )
+
+def get_rss_mb() -> float:
+    """Current resident memory of this process (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def count_open_sockets() -> int:
+    """Number of socket file descriptors this process holds open (-1 if unknown)."""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return -1
+    count = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                count += 1
+        except OSError:
+            continue
+    return count
+
+def slope(values: list[float]) -> float:
+    """Least-squares slope of values against their index (units per sample)."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    num = sum((i - mean_x) * (v - mean_y) for i, v in enumerate(values))
+    den = sum((i - mean_x) ** 2 for i in range(n))
+    return num / den
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty window."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+# --------------------------------------------------------------------------------
+# Shared Stats
+# --------------------------------------------------------------------------------
+class SoakStats:
+    """Thread-safe collector for per-turn results across all sessions."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.window_latencies = []   # latencies since the last sample (failed requests at their measured time)
+        self.window_errors = 0
+        self.window_depths = {}      # history depth -> latencies of successful turns since the last sample
+        self.depth_counts = {}       # history depth -> successful turns over the whole run
+        self.warm_sessions = 0       # sessions that have finished their first conversation
+        self.total_turns = 0
+        self.total_errors = 0
+        self.total_invalid = 0
+
+    def record_turn(self, turn: int, latency: float, valid: bool):
+        with self.lock:
+            self.window_latencies.append(latency)
+            self.window_depths.setdefault(turn, []).append(latency)
+            self.depth_counts[turn] = self.depth_counts.get(turn, 0) + 1
+            self.total_turns += 1
+            if not valid:
+                self.total_invalid += 1
+
+    def record_error(self, latency: float):
+        with self.lock:
+            self.window_latencies.append(latency)
+            self.total_errors += 1
+            self.window_errors += 1
+
+    def mark_warm(self):
+        with self.lock:
+            self.warm_sessions += 1
+
+    def drain_window(self) -> tuple[list[float], int, dict[int, list[float]]]:
+        with self.lock:
+            latencies, errors, depths = self.window_latencies, self.window_errors, self.window_depths
+            self.window_latencies, self.window_errors, self.window_depths = [], 0, {}
+        return latencies, errors, depths
+
+# --------------------------------------------------------------------------------
+# Simulated Session
+# --------------------------------------------------------------------------------
+def run_session(session_id: int, *, deadline: float, stats: SoakStats, scenarios: list[dict],
+                allowed_scenarios: set[str], available_scenarios_text: str):
+    """Hold a conversation open until the deadline, following the scenario flow."""
+    client = make_client()
+
+    # Shorten each session's first conversation by a session_id-based number of turns,
+    # so after the first reset the sessions sit at different history depths.
+    # Samples taken before every session has reset once are warmup and excluded from the baseline.
+    turns_this_conversation = SESSION_TURNS - (session_id * SESSION_TURNS // max(SESSIONS, 1))
+    first_conversation = True
+
+    msg_idx = session_id
+    while time.time() < deadline:
+        current_scenario = START_SCENARIO
+        messages = []
+
+        for _ in range(turns_this_conversation):
+            if time.time() >= deadline:
+                return
+
+            messages.append({"role": "user", "content": USER_MESSAGES[msg_idx % len(USER_MESSAGES)]})
+            msg_idx += 1
+
+            system_prompt = build_system_prompt(
+                available_scenarios_text=available_scenarios_text,
+                current_scenario=current_scenario,
+                instructions_text=get_instruction_text(scenarios, current_scenario),
+            )
+
+            t0 = time.time()
+            try:
+                response = client.chat.completions.create(
+                    model=MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        *messages
+                    ],
+                    response_model=ScenarioResponse,
+                    temperature=0.3,
+                    max_tokens=512,
+                )
+            except Exception as e:
+                stats.record_error(time.time() - t0)
+                print(f"{RED}[session {session_id}] ERROR:{RESET} {e}")
+                # Drop the unanswered user message so history stays user/assistant paired.
+                messages.pop()
+                time.sleep(THINK_TIME_SEC)
+                continue
+            duration = time.time() - t0
+
+            ok, _ = validate_next_scenario(response.next_scenario, allowed_scenarios, current_scenario)
+            # Exchanges already in the history (failed turns are popped, so this can lag the loop index).
+            stats.record_turn((len(messages) - 1) // 2, duration, ok)
+
+            messages.append({"role": "assistant", "content": response.assistant_response})
+            if ok:
+                current_scenario = response.next_scenario
+
+            time.sleep(THINK_TIME_SEC)
+
+        if first_conversation:
+            first_conversation = False
+            turns_this_conversation = SESSION_TURNS
+            stats.mark_warm()
+
+# --------------------------------------------------------------------------------
+# Drift Detection
+# --------------------------------------------------------------------------------
+def check_drift(samples: list[dict]) -> dict[str, str]:
+    """Compare recent samples against the baseline window; return {kind: alert message}."""
+    alerts = {}
+
+    def error_rate(window: list[dict]) -> float:
+        requests = sum(s["requests"] for s in window)
+        return sum(s["errors"] for s in window) / requests * 100 if requests else 0.0
+
+    # Failing requests: recent error rate too high on its own, warmup or not.
+    recent_rate = error_rate(samples[-BASELINE_SAMPLES:])
+    if recent_rate > ERROR_RATE_PCT:
+        alerts["errors"] = f"error rate is {recent_rate:.0f}% over the last {BASELINE_SAMPLES} samples"
+
+    samples = [s for s in samples if s["warm"]]
+    if len(samples) < BASELINE_SAMPLES * 2:
+        return alerts
+
+    baseline = samples[:BASELINE_SAMPLES]
+    recent = samples[-BASELINE_SAMPLES:]
+
+    # Memory leak: RSS grew past threshold and is still trending up.
+    rss_series = [s["rss_mb"] for s in samples]
+    rss_growth = statistics.median(s["rss_mb"] for s in recent) - statistics.median(s["rss_mb"] for s in baseline)
+    if rss_growth > RSS_GROWTH_MB and slope(rss_series) > 0:
+        alerts["memory"] = f"RSS grew {rss_growth:.1f} MB over baseline (slope {slope(rss_series):+.2f} MB/sample)"
+
+    # Connection leak: sockets keep piling up beyond what the sessions need.
+    if samples[-1]["sockets"] >= 0:
+        base_sockets = max(s["sockets"] for s in baseline)
+        conn_growth = min(s["sockets"] for s in recent) - base_sockets
+        if conn_growth > CONN_GROWTH:
+            alerts["connections"] = f"open sockets grew by {conn_growth} over baseline ({base_sockets} -> {samples[-1]['sockets']})"
+
+    # Steady slow-down: recent p50 well above baseline and trending up.
+    p50_series = [s["p50"] for s in samples if s["requests"] > 0]
+    base_p50 = [s["p50"] for s in baseline if s["requests"] > 0]
+    recent_p50 = [s["p50"] for s in recent if s["requests"] > 0]
+    if base_p50 and recent_p50:
+        base = statistics.median(base_p50)
+        drift_pct = (statistics.median(recent_p50) - base) / base * 100 if base > 0 else 0.0
+        if drift_pct > LATENCY_DRIFT_PCT and slope(p50_series) > 0:
+            alerts["latency"] = f"p50 latency drifted {drift_pct:+.0f}% over baseline ({base:.2f}s -> {statistics.median(recent_p50):.2f}s)"
+
+    # Failing requests: share of errors in recent windows well above the baseline share.
+    base_rate, recent_rate = error_rate(baseline), error_rate(recent)
+    if "errors" not in alerts and recent_rate - base_rate > ERROR_RATE_PCT:
+        alerts["errors"] = f"error rate rose to {recent_rate:.0f}% (baseline {base_rate:.0f}%)"
+
+    return alerts
+
+def print_turn_latencies(samples: list[dict], depth_counts: dict[int, int]):
+    """
+    p50 per turn (history depth), first vs second half of the samples, to show drift by depth.
+    Each half is the median of the per-sample p50s, so only one float per depth per sample is kept.
+    """
+    midpoint = len(samples) // 2
+    print(f"{GREEN}p50 by turn:  {RESET} turn  count  first-half  second-half")
+    for turn in sorted(depth_counts):
+        first = [s["depth_p50"][turn] for s in samples[:midpoint] if turn in s["depth_p50"]]
+        second = [s["depth_p50"][turn] for s in samples[midpoint:] if turn in s["depth_p50"]]
+        first_txt = f"{statistics.median(first):.2f}s" if first else "-"
+        second_txt = f"{statistics.median(second):.2f}s" if second else "-"
+        print(f"              {turn + 1:4d}  {depth_counts[turn]:5d}  {first_txt:>10}  {second_txt:>11}")
+
+# --------------------------------------------------------------------------------
+# Main
+# --------------------------------------------------------------------------------
+print(f"{YELLOW}Attempting connection to: {llm_url}...{RESET}")
+print(f"{YELLOW}Model endpoint: {MODEL}{RESET}")
+print(f"{YELLOW}Instructions file: {INSTRUCTIONS_JSON_PATH}{RESET}")
+print(f"{YELLOW}Soak: {SESSIONS} sessions x {DURATION_MIN:.0f} min, {SESSION_TURNS} turns/session, sample every {SAMPLE_SEC:.0f}s{RESET}\n")
+
+try:
+    scenarios = load_scenarios(INSTRUCTIONS_JSON_PATH)
+    allowed_scenarios = { (s.get("name") or "").strip() for s in scenarios if (s.get("name") or "").strip() }
+    if START_SCENARIO not in allowed_scenarios:
+        allowed_scenarios.add(START_SCENARIO)
+
+    available_scenarios_text = format_available_scenarios(scenarios)
+
+except Exception as e:
+    print(f"{RED}Failed to load/build scenario prompt:{RESET} {e}")
+    raise
+
+stats = SoakStats()
+start = time.time()
+deadline = start + DURATION_MIN * 60
+
+threads = [
+    threading.Thread(
+        target=run_session,
+        args=(i,),
+        kwargs=dict(
+            deadline=deadline,
+            stats=stats,
+            scenarios=scenarios,
+            allowed_scenarios=allowed_scenarios,
+            available_scenarios_text=available_scenarios_text,
+        ),
+        daemon=True,
+    )
+    for i in range(SESSIONS)
+]
+for t in threads:
+    t.start()
+
+samples = []
+raised_alerts = set()
+try:
+    while time.time() < deadline:
+        time.sleep(min(SAMPLE_SEC, max(0.0, deadline - time.time())))
+
+        latencies, errors, depths = stats.drain_window()
+        sample = {
+            "elapsed_min": (time.time() - start) / 60,
+            "rss_mb": get_rss_mb(),
+            "sockets": count_open_sockets(),
+            "threads": threading.active_count(),
+            "requests": len(latencies),
+            "turns": len(latencies) - errors,
+            "errors": errors,
+            "warm": stats.warm_sessions >= SESSIONS,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "depth_p50": {turn: percentile(lats, 50) for turn, lats in depths.items()},
+        }
+        samples.append(sample)
+
+        print(
+            f"{CYAN}[{sample['elapsed_min']:6.1f} min]{RESET} "
+            f"rss={sample['rss_mb']:.1f}MB sockets={sample['sockets']} threads={sample['threads']} "
+            f"turns={sample['turns']} errors={sample['errors']} "
+            f"p50={sample['p50']:.2f}s p95={sample['p95']:.2f}s"
+            f"{'' if sample['warm'] else ' (warmup)'}"
+        )
+
+        # Only shout about each kind of problem once while running; the summary repeats them.
+        for kind, alert in check_drift(samples).items():
+            if kind not in raised_alerts:
+                raised_alerts.add(kind)
+                print(f"{RED}ALERT ({kind}):{RESET} {alert}")
+
+    # Let in-flight requests finish (bounded by the client timeout).
+    for t in threads:
+        t.join(timeout=30)
+
+except KeyboardInterrupt:
+    print(f"\n{YELLOW}Interrupted, summarising what we have...{RESET}")
+
+# --------------------------------------------------------------------------------
+# Summary
+# --------------------------------------------------------------------------------
+final_alerts = check_drift(samples)
+if stats.total_turns == 0 and stats.total_errors > 0:
+    final_alerts["errors"] = f"every request failed ({stats.total_errors} errors, 0 successful turns)"
+
+print(f"\n{CYAN}--- SOAK SUMMARY ---{RESET}")
+end = time.time()
+print(f"{GREEN}Duration:     {RESET} {(end - start) / 60:.1f} min")
+print(f"{GREEN}Turns:        {RESET} {stats.total_turns}")
+print(f"{GREEN}Errors:       {RESET} {stats.total_errors}")
+print(f"{GREEN}Invalid next: {RESET} {stats.total_invalid}")
+if samples:
+    print(f"{GREEN}RSS:          {RESET} {samples[0]['rss_mb']:.1f}MB -> {samples[-1]['rss_mb']:.1f}MB")
+    print(f"{GREEN}Sockets:      {RESET} {samples[0]['sockets']} -> {samples[-1]['sockets']}")
+    print(f"{GREEN}p50 latency:  {RESET} {samples[0]['p50']:.2f}s -> {samples[-1]['p50']:.2f}s")
+print_turn_latencies(samples, stats.depth_counts)
+warm_count = sum(1 for s in samples if s["warm"])
+if warm_count < BASELINE_SAMPLES * 2:
+    print(f"{YELLOW}Not enough post-warmup samples for drift detection (need {BASELINE_SAMPLES * 2}, got {warm_count}).{RESET}")
+for kind, alert in final_alerts.items():
+    print(f"{RED}ALERT ({kind}):{RESET} {alert}")
+if not final_alerts:
+    print(f"{GREEN}No leaks or drift detected.{RESET}")
+print(f"{CYAN}-------------------------------{RESET}")
+
+sys.exit(ALERT_EXIT_CODE if final_alerts else 0)
+EOF
+
+# ================================================================================
+# 4. Create Dockerfile
+# ================================================================================
+log_step "4" "Generating Dockerfile"
+cat <<EOF > Dockerfile
+FROM python:3.11-slim
+WORKDIR /app
+
+# Force python to print
+ENV PYTHONUNBUFFERED=1
+
+RUN pip install --no-cache-dir instructor openai pydantic httpx
+COPY main.py .
+COPY instructions.json .
+CMD ["python", "main.py"]
+EOF
+
+# ================================================================================
+# 5. Build Image
+# ================================================================================
+log_step "5" "Building Docker Image"
+echo -e "${YELLOW}Building... ${NC}"
+
+if sudo docker build -t soak-bot-image . ; then
+    echo -e "${GREEN}Build Successful!${NC}"
+else
+    echo -e "${RED}Build Failed!.${NC}"
+    # Re-run visibly if silent build failed
+    sudo docker build -t soak-bot-image .
+    exit 1
+fi
+
+# ================================================================================
+# 6. Run Container
+# ================================================================================
+log_step "6" "Running Container"
+echo -e "${YELLOW}Soak Test: ${SOAK_SESSIONS} sessions for ${SOAK_DURATION_MIN} min${NC}"
+
+sudo docker run --rm --network="host" \
+  -e LLM_URL="$TARGET_URL" \
+  -e LLM_KEY="$TARGET_KEY" \
+  -e SOAK_DURATION_MIN="$SOAK_DURATION_MIN" \
+  -e SOAK_SESSIONS="$SOAK_SESSIONS" \
+  -e SOAK_SESSION_TURNS="$SOAK_SESSION_TURNS" \
+  -e SOAK_SAMPLE_SEC="$SOAK_SAMPLE_SEC" \
+  -e SOAK_THINK_TIME_SEC="$SOAK_THINK_TIME_SEC" \
+  -e SOAK_BASELINE_SAMPLES="$SOAK_BASELINE_SAMPLES" \
+  -e SOAK_RSS_GROWTH_MB="$SOAK_RSS_GROWTH_MB" \
+  -e SOAK_CONN_GROWTH="$SOAK_CONN_GROWTH" \
+  -e SOAK_LATENCY_DRIFT_PCT="$SOAK_LATENCY_DRIFT_PCT" \
+  -e SOAK_ERROR_RATE_PCT="$SOAK_ERROR_RATE_PCT" \
+  soak-bot-image
+SOAK_STATUS=$?
+
+# ================================================================================
+# 7. Cleanup
+# ================================================================================
+log_step "7" "Cleaning up temporary files"
+cd ..
+sudo rm -rf soak_bot_build
+echo -e "${GREEN}Cleanup complete. Execution finished.${NC}"
+
+# main.py exits 2 when leak/drift/error alerts fired; anything else non-zero is a crash or docker failure.
+if [ $SOAK_STATUS -eq 2 ]; then
+    echo -e "${RED}Soak test failed: alerts fired. See summary above.${NC}"
+elif [ $SOAK_STATUS -ne 0 ]; then
+    echo -e "${RED}Soak test exited with code $SOAK_STATUS.${NC}"
+fi
+exit $SOAK_STATUS